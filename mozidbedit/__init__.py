@@ -6,10 +6,12 @@
 #   – Python source code by Erin Yuki Schlarb, 2020–2024.
 #   - extended by mirabilos, 2023.
 
-import argparse
 import collections.abc
+import functools
 import importlib.metadata
+import io
 import json
+import math
 import pathlib
 import pprint
 import re
@@ -18,9 +20,15 @@ import shlex
 import sys
 import typing as ty
 
-import jmespath
+# `jmespath` and the database module (along with its dependencies) are only
+# imported where needed, as many command invocations never use them
+if ty.TYPE_CHECKING:
+	from . import mozidb
 
-from . import mozidb
+try:
+	import orjson
+except ImportError:
+	orjson = None  # Optional, only used to speed up JSON processing
 
 __dir__ = pathlib.Path(__file__).parent
 __version__ = importlib.metadata.version("moz-idb-edit")
@@ -29,31 +37,81 @@ __version__ = importlib.metadata.version("moz-idb-edit")
 USER_CONTEXT_WEB_EXT = "userContextIdInternal.webextStorageLocal"
 
 
+# Translation tables between origins and their storage directory names
+_SITE_TRANS = str.maketrans({":": "+", "/": "+"})
+_FILE_TRANS = str.maketrans({"+": "/"})
+_ORIGIN_TRANS = str.maketrans({"+": ":"})
+
+
+# Prefer the faster `orjson` parser if available, it accepts the same `bytes`
+# and `str` inputs and raises `ValueError` subclasses on invalid input as well
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
 # Based on https://stackoverflow.com/a/24563687/277882
 USER_PREF_RE = re.compile(rb"\s*user_pref\(([\"'])(.+?)\1,\s*(.+?)\);")
-def read_user_prefs(prefs_path: os.PathLike):
+def _split_user_pref(line: bytes) -> ty.Optional[ty.Tuple[bytes, bytes]]:
+	"""Extract the raw key and value of a `user_pref(…);` line
+
+	Same result as matching `USER_PREF_RE`, but the common case is handled
+	using plain substring searches rather than the regex engine.
+	"""
+	stripped = line.lstrip()
+	if not stripped.startswith(b"user_pref("):
+		return None  # Cannot match the regex either
+
+	quote = stripped[10:11]
+	if quote == b"\"" or quote == b"'":
+		key_end = stripped.find(quote + b",", 12)
+		if key_end >= 0:
+			value = stripped[key_end + 2:].lstrip()
+			value_end = value.find(b");", 1)
+			if value_end >= 0:
+				return stripped[11:key_end], value[:value_end]
+
+	# Leave unusual lines to the regex to get its exact backtracking behaviour
+	m = USER_PREF_RE.match(line)
+	if not m:
+		return None
+	return m.group(2), m.group(3)
+
+def read_user_prefs(prefs_path: os.PathLike, name: ty.Optional[str] = None):
+	"""Yield the name and value of each preference set in the given `prefs.js`
+
+	If `name` is given, only the values of preferences with exactly that name
+	are decoded and yielded, so that looking up a single preference doesn't
+	require parsing all others and can stop at the first match.
+	"""
+	raw_name = name.encode("utf-8") if name is not None else None
+
 	try:
 		with open(prefs_path, "rb") as file:
-			for line_no, line in enumerate(file, 1):
-				m = USER_PREF_RE.match(line)
-				if not m:
-					continue
-				k, v = m.group(2), m.group(3)
-				try:
-					k = k.decode("utf-8")
-					v = json.loads(v)
-				except (ValueError, UnicodeDecodeError) as exc:
-					print(f"Failed to parse {prefs_path}:{line_no}: {type(exc).__name__}: {exc}", file=sys.stderr)
-				else:
-					yield k, v
+			data = file.read()
 	except FileNotFoundError:
-		pass
+		return
+
+	# Split the (small) file in one go rather than reading it line-by-line;
+	# we still iterate per line to be able to report line numbers on errors
+	for line_no, line in enumerate(data.splitlines(), 1):
+		kv = _split_user_pref(line)
+		if kv is None:
+			continue
+		k, v = kv
+		if raw_name is not None and k != raw_name:
+			continue
+		try:
+			k = k.decode("utf-8")
+			v = _json_loads(v)
+		except (ValueError, UnicodeDecodeError) as exc:
+			print(f"Failed to parse {prefs_path}:{line_no}: {type(exc).__name__}: {exc}", file=sys.stderr)
+		else:
+			yield k, v
 
 
 def read_user_contexts(profile_dir: pathlib.Path):
 	try:
 		with open(profile_dir / "containers.json", "rb") as file:
-			data = json.load(file)
+			data = _json_loads(file.read())
 
 		assert data["version"] in (4, 5)
 
@@ -76,27 +134,39 @@ def read_user_contexts(profile_dir: pathlib.Path):
 
 
 def find_uuid_by_ext_id(profile_dir: pathlib.Path, ext_id: str) -> ty.Optional[str]:
-	for name, value in read_user_prefs(profile_dir / "prefs.js"):
-		if name == "extensions.webextensions.uuids":
-			try:
-				value = json.loads(value)
-				return value.get(ext_id, None)
-			except ValueError:
-				pass
+	for _, value in read_user_prefs(profile_dir / "prefs.js", "extensions.webextensions.uuids"):
+		try:
+			value = _json_loads(value)
+			return value.get(ext_id, None)
+		except ValueError:
+			pass
 
 def find_ext_info(profile_dir: pathlib.Path) -> ty.Iterator[ty.Tuple[str, str]]:
 	with open(profile_dir / "extensions.json", "rb") as f:
-		ext_data = json.load(f)
+		ext_data = _json_loads(f.read())
 	assert ext_data.get("schemaVersion") == 36
 
 	for extension in ext_data["addons"]:
 		yield extension["id"], extension["defaultLocale"]["name"]
 
 
-def find_context_id_by_name(profile_dir: pathlib.Path, name: str) -> int:
+@functools.lru_cache(maxsize=None)
+def _read_user_context_maps(profile_dir: pathlib.Path) -> ty.Tuple[ty.Dict[int, str], ty.Dict[str, int]]:
+	"""Parse `containers.json` once into ID → name and name → ID mappings"""
+	names_by_id: ty.Dict[int, str] = {}
+	ids_by_name: ty.Dict[str, int] = {}
 	for ctx_id, ctx_name in read_user_contexts(profile_dir):
-		if ctx_name == name:
-			return ctx_id
+		# Keep the first entry on duplicates, like a linear search would
+		names_by_id.setdefault(ctx_id, ctx_name)
+		ids_by_name.setdefault(ctx_name, ctx_id)
+	return names_by_id, ids_by_name
+
+
+def find_context_id_by_name(profile_dir: pathlib.Path, name: str) -> int:
+	try:
+		return _read_user_context_maps(profile_dir)[1][name]
+	except KeyError:
+		pass
 
 	if name == USER_CONTEXT_WEB_EXT:
 		return 4294967295  # Default value (-1 as unsigned 32-value)
@@ -105,24 +175,47 @@ def find_context_id_by_name(profile_dir: pathlib.Path, name: str) -> int:
 
 
 def find_context_name_by_id(profile_dir: pathlib.Path, id: int) -> str:
-	for ctx_id, ctx_name in read_user_contexts(profile_dir):
-		if ctx_id == id:
-			return ctx_name
-
-	raise KeyError(id)
+	return _read_user_context_maps(profile_dir)[0][id]
 
 
 class IDBObjectWrapper(collections.abc.Mapping):
-	def __init__(self, conn: mozidb.IndexedDB):
+	"""Read-only mapping view of all objects stored in an IndexedDB database
+
+	Iterating over all items or values decodes all objects at once and keeps
+	them around for later accesses, while looking up single keys only decodes
+	that object (unless everything has already been loaded). Pass `lazy=True`
+	to never keep any decoded objects around.
+	"""
+	_cache: ty.Optional[ty.Dict[object, object]]
+
+	def __init__(self, conn: "mozidb.IndexedDB", lazy: bool = False):
 		self._conn = conn
+		self._lazy = lazy
+		self._cache = None
+
+	def _load(self) -> ty.Dict[object, object]:
+		if self._lazy:
+			return self._conn.read_objects()
+		if self._cache is None:
+			self._cache = self._conn.read_objects()
+		return self._cache
 
 	def __getitem__(self, name: str) -> object:
+		if self._cache is not None:
+			return self._cache[name]
 		return self._conn.read_object(name)
 
 	def __iter__(self) -> ty.Iterator[object]:
-		yield from self._conn.list_objects()
+		# Callers iterating over the keys typically go on to look up each of
+		# them, so load everything at once unless asked not to
+		if self._lazy:
+			yield from self._conn.list_objects()
+		else:
+			yield from self._load()
 
 	def __len__(self) -> int:
+		if self._cache is not None:
+			return len(self._cache)
 		return self._conn.count_objects()
 
 	def __repr__(self) -> str:
@@ -130,13 +223,15 @@ class IDBObjectWrapper(collections.abc.Mapping):
 		return f"{{{inner_repr}}}"
 
 	def keys(self) -> ty.List[object]:
+		if self._cache is not None:
+			return list(self._cache)
 		return self._conn.list_objects()
 
 	def items(self) -> ty.Iterable[ty.Tuple[object, object]]:
-		return self._conn.read_objects().items()
+		return self._load().items()
 
 	def values(self) -> ty.Iterable[object]:
-		return self._conn.read_objects().values()
+		return self._load().values()
 
 
 def _safe_repr(object, context, maxlevels, level, sort_dicts):
@@ -144,85 +239,153 @@ def _safe_repr(object, context, maxlevels, level, sort_dicts):
 
 	Code copied from Python 3.9 stdlib pprint.py module.
 	"""
-	if object is NotImplemented:
-		return "undefined", True, False
+	buf = io.StringIO()
+	readable, recursive = _safe_repr_into(buf, object, context, maxlevels, level, sort_dicts)
+	return buf.getvalue(), readable, recursive
+
+def _safe_repr_into(buf, object, context, maxlevels, level, sort_dicts):
+	"""Like `_safe_repr`, but writes the representation into the given buffer
 
+	Nested values are written into the same buffer rather than building and
+	joining intermediate strings at every level.
+	"""
+	# Fast path: Exact builtin (and our own) types map directly to a handler
 	typ = type(object)
-	if typ in _builtin_scalars:
-		# This is the actual patch: Use the JSON library to generate `repr` for
-		# all primitive types
-		return json.dumps(object, ensure_ascii=False), True, False
+	handler = _safe_repr_dispatch.get(typ)
+	if handler is not None:
+		return handler(buf, object, context, maxlevels, level, sort_dicts)
 
 	r = getattr(typ, "__repr__", None)
 	# Also allow our custom type to be treated as dict
 	if issubclass(typ, (dict, IDBObjectWrapper)) and \
 	   r in (dict.__repr__, IDBObjectWrapper.__repr__):
-		if not object:
-			return "{}", True, False
-		objid = id(object)
-		if maxlevels and level >= maxlevels:
-			return "{...}", False, objid in context
-		if objid in context:
-			return _recursion(object), False, True
-		context[objid] = 1
-		readable = True
-		recursive = False
-		components = []
-		append = components.append
-		level += 1
-		if sort_dicts:
-			items = sorted(object.items(), key=_safe_tuple)
-		else:
-			items = object.items()
-		for k, v in items:
-			krepr, kreadable, krecur = _safe_repr(k, context, maxlevels, level, sort_dicts)
-			vrepr, vreadable, vrecur = _safe_repr(v, context, maxlevels, level, sort_dicts)
-			append("%s: %s" % (krepr, vrepr))
-			readable = readable and kreadable and vreadable
-			if krecur or vrecur:
-				recursive = True
-		del context[objid]
-		return "{%s}" % ", ".join(components), readable, recursive
+		return _safe_repr_dict(buf, object, context, maxlevels, level, sort_dicts)
 
 	if (issubclass(typ, list) and r is list.__repr__) or \
 	   (issubclass(typ, tuple) and r is tuple.__repr__):
-		if issubclass(typ, list):
-			if not object:
-				return "[]", True, False
-			format = "[%s]"
-		elif len(object) == 1:
-			format = "(%s,)"
-		else:
-			if not object:
-				return "()", True, False
-			format = "(%s)"
-		objid = id(object)
-		if maxlevels and level >= maxlevels:
-			return format % "...", False, objid in context
-		if objid in context:
-			return _recursion(object), False, True
-		context[objid] = 1
-		readable = True
-		recursive = False
-		components = []
-		append = components.append
-		level += 1
-		for o in object:
-			orepr, oreadable, orecur = _safe_repr(o, context, maxlevels, level, sort_dicts)
-			append(orepr)
-			if not oreadable:
-				readable = False
-			if orecur:
-				recursive = True
-		del context[objid]
-		return format % ", ".join(components), readable, recursive
+		return _safe_repr_sequence(buf, object, context, maxlevels, level, sort_dicts)
 
 	rep = repr(object)
-	return rep, (rep and not rep.startswith("<")), False
+	buf.write(rep)
+	return (rep and not rep.startswith("<")), False
+
+def _safe_repr_undefined(buf, object, context, maxlevels, level, sort_dicts):
+	buf.write("undefined")
+	return True, False
+
+def _safe_repr_scalar(buf, object, context, maxlevels, level, sort_dicts):
+	# This is the actual patch: Use the JSON library to generate `repr` for
+	# all primitive types
+	buf.write(json.dumps(object, ensure_ascii=False))
+	return True, False
+
+def _safe_repr_dict(buf, object, context, maxlevels, level, sort_dicts):
+	if not object:
+		buf.write("{}")
+		return True, False
+	objid = id(object)
+	if maxlevels and level >= maxlevels:
+		buf.write("{...}")
+		return False, objid in context
+	if objid in context:
+		buf.write(_recursion(object))
+		return False, True
+	context[objid] = 1
+	readable = True
+	recursive = False
+	write = buf.write
+	level += 1
+	if sort_dicts:
+		items = list(object.items())
+		if all(isinstance(k, str) for k, _ in items):
+			# Fast path: Unique string keys are always orderable and
+			# tuple comparison will never need to look at the values
+			items.sort()
+		else:
+			items.sort(key=_safe_tuple)
+	else:
+		items = object.items()
+	write("{")
+	separator = ""
+	for k, v in items:
+		write(separator)
+		separator = ", "
+		# Format scalar keys and values inline rather than through another
+		# (comparatively expensive) recursive call, as they make up most of
+		# the nodes in typical data
+		if type(k) in _builtin_scalars:
+			write(json.dumps(k, ensure_ascii=False))
+			kreadable, krecur = True, False
+		else:
+			kreadable, krecur = _safe_repr_into(buf, k, context, maxlevels, level, sort_dicts)
+		write(": ")
+		if type(v) in _builtin_scalars:
+			write(json.dumps(v, ensure_ascii=False))
+			vreadable, vrecur = True, False
+		else:
+			vreadable, vrecur = _safe_repr_into(buf, v, context, maxlevels, level, sort_dicts)
+		readable = readable and kreadable and vreadable
+		if krecur or vrecur:
+			recursive = True
+	write("}")
+	del context[objid]
+	return readable, recursive
+
+def _safe_repr_sequence(buf, object, context, maxlevels, level, sort_dicts):
+	if isinstance(object, list):
+		if not object:
+			buf.write("[]")
+			return True, False
+		start, end = "[", "]"
+	elif len(object) == 1:
+		start, end = "(", ",)"
+	else:
+		if not object:
+			buf.write("()")
+			return True, False
+		start, end = "(", ")"
+	objid = id(object)
+	if maxlevels and level >= maxlevels:
+		buf.write(start + "..." + end)
+		return False, objid in context
+	if objid in context:
+		buf.write(_recursion(object))
+		return False, True
+	context[objid] = 1
+	readable = True
+	recursive = False
+	write = buf.write
+	level += 1
+	write(start)
+	separator = ""
+	for o in object:
+		write(separator)
+		separator = ", "
+		if type(o) in _builtin_scalars:
+			write(json.dumps(o, ensure_ascii=False))
+			continue
+		oreadable, orecur = _safe_repr_into(buf, o, context, maxlevels, level, sort_dicts)
+		if not oreadable:
+			readable = False
+		if orecur:
+			recursive = True
+	write(end)
+	del context[objid]
+	return readable, recursive
 
 _builtin_scalars = frozenset({str, bytes, bytearray, int, float, complex,
                               bool, type(None)})
 
+# Handlers for exact types, subclasses are matched by `_safe_repr` separately
+_safe_repr_dispatch = {
+	type(NotImplemented): _safe_repr_undefined,
+	**{typ: _safe_repr_scalar for typ in _builtin_scalars},
+	dict: _safe_repr_dict,
+	IDBObjectWrapper: _safe_repr_dict,
+	list: _safe_repr_sequence,
+	tuple: _safe_repr_sequence,
+}
+
 def _recursion(object):
 	return ("<Recursion on %s with id=%s>"
 	        % (type(object).__name__, id(object)))
@@ -253,6 +416,70 @@ def _safe_tuple(t):
 	return _safe_key(t[0]), _safe_key(t[1])
 
 
+def _orjson_default(object):
+	"""Convert values not natively supported by `orjson` into ones that are"""
+	if isinstance(object, IDBObjectWrapper):
+		return dict(object.items())
+	if isinstance(object, (bytes, bytearray)):
+		return repr(object)
+
+	# Subclasses of builtin types are only safe to serialize as their base type
+	# if they don't add their own `repr` (such as `mozserial.JSInt32`, but not
+	# `mozserial.JSBigInt`)
+	for base in (int, float, str, dict, list):
+		if isinstance(object, base) and type(object).__repr__ is base.__repr__:
+			return base(object)
+
+	raise TypeError(f"Type is not JSON serializable: {type(object).__name__}")
+
+def _contains_non_json_value(object) -> bool:
+	"""Check whether there is a tuple or a NaN or infinite float anywhere within
+	the object
+
+	`orjson` silently writes these as arrays and `null` respectively, while
+	`_safe_repr` keeps them distinguishable.
+	"""
+	seen = set()
+	stack = [object]
+	while stack:
+		value = stack.pop()
+		if isinstance(value, float):
+			if not math.isfinite(value):
+				return True
+		elif isinstance(value, tuple):
+			return True
+		elif isinstance(value, (dict, IDBObjectWrapper, list)):
+			if id(value) in seen:
+				continue
+			seen.add(id(value))
+			stack.extend(value.values() if isinstance(value, (dict, IDBObjectWrapper)) else value)
+	return False
+
+def _dumps_json_pretty(object, sort_keys: bool = True) -> bytes:
+	"""Serialize the given object as indented JSON using `orjson`
+
+	Raises `TypeError` if `orjson` is not available or the object contains
+	values without an exact JSON representation, in which case the caller is
+	expected to fall back to `PrettyPrinter`'s `_safe_repr` based output.
+	"""
+	if orjson is None:
+		raise TypeError("orjson is not available")
+
+	# Non-string keys are intentionally rejected (raising `TypeError`), as
+	# converting them to strings could make distinct keys collide
+	option = orjson.OPT_INDENT_2 \
+	       | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_SUBCLASS
+	if sort_keys:
+		option |= orjson.OPT_SORT_KEYS
+	output = orjson.dumps(object, default=_orjson_default, option=option)
+
+	# Keep the output format of tuples and non-finite floats the same whether
+	# or not anything else in the object requires the `_safe_repr` fallback
+	if _contains_non_json_value(object):
+		raise TypeError("Tuples and non-finite floats are not JSON serializable")
+	return output
+
+
 class PrettyPrinter(pprint.PrettyPrinter):
 	def format(self, object, context, maxlevels, level):
 		return _safe_repr(object, context, maxlevels, level, self._sort_dicts)
@@ -272,23 +499,87 @@ class PrettyPrinter(pprint.PrettyPrinter):
 	_dispatch[IDBObjectWrapper.__repr__] = pprint.PrettyPrinter._pprint_dict
 
 
-def find_default_profile_dir() -> ty.Optional[pathlib.Path]:
-	# Determine system default Mozilla directory
+@functools.lru_cache(maxsize=None)
+def _find_moz_dir() -> pathlib.Path:
+	"""Determine system default Mozilla directory
+
+	The platform detection may be expensive, so the result is only computed
+	once per process.
+	"""
 	import platform
 	if platform.win32_ver()[0]:  # Windows
-		mozdir = pathlib.Path(os.environ["APPDATA"]) / "Mozilla" / "Firefox"
+		return pathlib.Path(os.environ["APPDATA"]) / "Mozilla" / "Firefox"
 	elif platform.mac_ver()[0]:  # macOS
-		mozdir = pathlib.Path.home() / "Application Support" / "Firefox"
+		return pathlib.Path.home() / "Application Support" / "Firefox"
 	else:  # Unix/Linux
-		mozdir = pathlib.Path.home() / ".mozilla" / "firefox"
+		return pathlib.Path.home() / ".mozilla" / "firefox"
+
+
+def _parse_default_profile_path(data: bytes) -> ty.Optional[str]:
+	"""Find the path of the default profile in the given `profiles.ini` contents
+
+	Only handles the plain `[Section]` and `key=value` subset of the INI
+	syntax written by Firefox and raises `ValueError` on anything else, so
+	that the caller can fall back to the full `configparser` module.
+	"""
+	def is_default_profile(name: ty.Optional[str], options: ty.Dict[str, str]) -> bool:
+		return name is not None and name.startswith("Profile") \
+		       and "path" in options and options.get("default") == "1"
+
+	name: ty.Optional[str] = None
+	options: ty.Dict[str, str] = {}
+	seen_names: ty.Set[str] = set()
+	for line in data.decode("utf-8").splitlines():
+		value = line.strip()
+		if not value or value[0] in "#;":
+			continue
+		if line[0].isspace():
+			raise ValueError("Continuation lines are not supported")
+
+		if value.startswith("["):
+			if is_default_profile(name, options):
+				return options["path"]
+			if not value.endswith("]") or value in ("[]", "[DEFAULT]") or value[1:-1] in seen_names:
+				raise ValueError(f"Unsupported section header: {value}")
+			name, options = value[1:-1], {}
+			seen_names.add(name)
+			continue
+
+		sep_idx = min((idx for idx in (value.find("="), value.find(":")) if idx >= 0), default=-1)
+		key = value[:sep_idx].strip().lower()
+		if name is None or sep_idx < 0 or not key or key in options:
+			raise ValueError(f"Unsupported line: {value}")
+		options[key] = value[sep_idx + 1:].strip()
+
+	if is_default_profile(name, options):
+		return options["path"]
+	return None
+
+
+def find_default_profile_dir() -> ty.Optional[pathlib.Path]:
+	mozdir = _find_moz_dir()
 
 	# Attempt to read profile information for Mozilla directory
+	try:
+		with open(mozdir / "profiles.ini", "rb") as file:
+			data = file.read()
+	except OSError:
+		return None
+
+	# Look for path of default profile directory entry in the profile
+	# information, using a simple dedicated parser first
+	try:
+		profile_path = _parse_default_profile_path(data)
+	except ValueError:
+		pass
+	else:
+		return mozdir / profile_path if profile_path is not None else None
+
+	# Let `configparser` handle any less common syntax
 	from configparser import ConfigParser
 	mozini = ConfigParser(interpolation=None)
 	mozini.read(mozdir / "profiles.ini")  # silently ignores non-existent files
 
-	# Look for path of default profile directory entry in the parsed profile
-	# information
 	for s in mozini.sections():
 		if not s.startswith("Profile"):
 			continue
@@ -303,19 +594,143 @@ def find_default_profile_dir() -> ty.Optional[pathlib.Path]:
 	return None
 
 
+def _read_idb_name(db_path: pathlib.Path) -> ty.Optional[str]:
+	from . import mozidb
+	with mozidb.IndexedDB(db_path) as conn:
+		return conn.get_name()
+
+
 def discover_idbs(sitebase):
+	with os.scandir(sitebase) as it:
+		db_paths = [sitebase / de.name for de in it if de.name.endswith(".sqlite")]
+
+	# Opening each database is mostly waiting for disk I/O (during which
+	# SQLite releases the GIL), so probe them in parallel – unless there are
+	# only a few of them (the usual case), where setting up threads costs more
+	if len(db_paths) <= 2:
+		db_names = [_read_idb_name(db_path) for db_path in db_paths]
+	else:
+		import concurrent.futures
+		with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+			db_names = list(executor.map(_read_idb_name, db_paths))
+
 	dbs = {}
-	for db_path in sitebase.iterdir():
-		if not db_path.name.endswith(".sqlite"):
-			continue
-		with mozidb.IndexedDB(db_path) as conn:
-			db_name = conn.get_name()
-			if db_name is not None:
-				dbs[db_name] = db_path
+	for db_path, db_name in zip(db_paths, db_names):
+		if db_name is not None:
+			dbs[db_name] = db_path
 	return dbs
 
 
+def _format_result(result: object) -> bytes:
+	"""Format a query result for output, as JSON if possible"""
+	# JSON-compatible results (such as most scalars) don't need to involve
+	# the pretty printer at all
+	try:
+		return _dumps_json_pretty(result) + b"\n"
+	except TypeError:
+		return (PrettyPrinter().pformat(result) + "\n").encode("utf-8")
+
+
+def _write_output(output: bytes) -> None:
+	"""Write formatted output to stdout, as bytes if possible"""
+	stdout_buffer = getattr(sys.stdout, "buffer", None)
+	if stdout_buffer is not None:
+		sys.stdout.flush()
+		stdout_buffer.write(output)
+	else:
+		sys.stdout.write(output.decode("utf-8"))
+
+
+def serve_queries(socket_path: os.PathLike, conn: "mozidb.IndexedDB", timeout: float = 10.0) -> None:
+	"""Answer JMESPath queries sent to the given Unix socket path until interrupted
+
+	Each client connection sends a single query expression terminated by
+	a newline and receives either `+` followed by the formatted result or
+	`-` followed by an error message. Clients are served one at a time and
+	dropped if they take longer than `timeout` seconds to send or receive.
+	The database contents are only read once, so later changes to it are
+	not picked up by a running server.
+
+	A socket file left behind by a server that is no longer running is
+	replaced; if another server is still listening, `OSError` is raised.
+	"""
+	import errno
+	import socket
+
+	import jmespath
+
+	# Decode all objects up front, so that every query is answered from the
+	# same in-memory snapshot without touching the database again
+	wrapper = IDBObjectWrapper(conn)
+	wrapper._load()
+
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+		try:
+			server.bind(os.fspath(socket_path))
+		except OSError as exc:
+			if exc.errno != errno.EADDRINUSE:
+				raise
+
+			# Only take over the path if nobody is listening on it anymore
+			with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+				try:
+					probe.connect(os.fspath(socket_path))
+				except ConnectionRefusedError:
+					pass
+				else:
+					raise
+			os.unlink(socket_path)
+			server.bind(os.fspath(socket_path))
+
+		try:
+			server.listen()
+			while True:
+				client, _ = server.accept()
+				# A misbehaving client must not take down or block the server
+				try:
+					with client, client.makefile("rb") as rfile:
+						client.settimeout(timeout)
+						line = rfile.readline()
+						try:
+							expression = line.decode("utf-8").rstrip("\n")
+							response = b"+" + _format_result(jmespath.search(expression, wrapper))
+						except Exception as exc:
+							response = f"-{type(exc).__name__}: {exc}\n".encode("utf-8")
+						client.sendall(response)
+				except OSError as exc:
+					print(f"Dropped client connection: {type(exc).__name__}: {exc}", file=sys.stderr)
+		finally:
+			os.unlink(socket_path)
+
+
+def query_server(socket_path: os.PathLike, expression: str) -> int:
+	"""Send a JMESPath query to a server started by `serve_queries` and print its result"""
+	import socket
+
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+		client.connect(os.fspath(socket_path))
+		client.sendall(expression.encode("utf-8") + b"\n")
+		with client.makefile("rb") as rfile:
+			response = rfile.read()
+
+	if not response:
+		print("Server closed connection without a response", file=sys.stderr)
+		return 1
+	if not response.startswith(b"+"):
+		sys.stderr.write(response[1:].decode("utf-8", "replace"))
+		return 1
+
+	_write_output(response[1:])
+	return 0
+
+
 def main(argv=sys.argv[1:], program=sys.argv[0]):
+	# Answer plain version queries without paying for setting up `argparse`
+	if argv in (["-V"], ["--version"]):
+		print(pathlib.Path(program).name, __version__)
+		return 0
+
+	import argparse
 	parser = argparse.ArgumentParser(description=__doc__, prog=pathlib.Path(program).name)
 	parser.add_argument("-V", "--version", action="version", version="%(prog)s {0}".format(__version__))
 	parser.add_argument("-x", "--extension", action="store", metavar="EXT_ID",
@@ -335,11 +750,34 @@ def main(argv=sys.argv[1:], program=sys.argv[0]):
 	                         "when determining the database path.")
 	parser.add_argument("-profile", "--profile", metavar="PROFILE", type=pathlib.Path,
 	                    help="Path to the Firefox/MozTK application profile directory.")
+	parser.add_argument("--daemon", action="store", metavar="SOCKET", type=pathlib.Path,
+	                    help="Keep the selected database open and answer queries "
+	                         "sent to the given Unix socket path using --client.")
+	parser.add_argument("--client", action="store", metavar="SOCKET", type=pathlib.Path,
+	                    help="Send the query to a database server started with --daemon.")
 	parser.add_argument("key_name", metavar="KEY", default="@", nargs="?",
 	                    help="JMESPath of the key to query.")
 
 	args = parser.parse_args(argv)
 
+	if args.daemon or args.client:
+		import socket
+		if not hasattr(socket, "AF_UNIX"):
+			parser.error("--daemon and --client require Unix socket support")
+			return 1
+
+	if args.client:
+		if args.daemon or args.dbpath or args.extension or args.list_extensions \
+		   or args.list_sites or args.site or args.sdb or args.userctx or args.profile:
+			parser.error("--client cannot be combined with --daemon or database selection options")
+			return 1
+
+		try:
+			return query_server(args.client, args.key_name)
+		except OSError as exc:
+			parser.error(f"Could not query server at {args.client}: {exc.strerror or exc}")
+			return 1
+
 	if int(bool(args.dbpath)) + int(bool(args.extension)) + int(args.list_extensions) + int(args.list_sites) + int(bool(args.site)) != 1:
 		parser.error("Exactly one of --dbpath, --extension, --list-sites or --site must be used")
 		return 1
@@ -348,6 +786,10 @@ def main(argv=sys.argv[1:], program=sys.argv[0]):
 		parser.error("--sdb requires --site")
 		return 1
 
+	if args.daemon and (args.list_extensions or args.list_sites or (args.site and not args.sdb)):
+		parser.error("--daemon requires a single database (--dbpath, --extension or --site with --sdb)")
+		return 1
+
 	profile_path: ty.Optional[pathlib.Path] = args.profile
 	db_path: ty.Optional[pathlib.Path] = args.dbpath
 
@@ -386,8 +828,11 @@ def main(argv=sys.argv[1:], program=sys.argv[0]):
 			db_path = profile_path / "storage" / "default" / origin_label
 			db_path = db_path / "idb" / "3647222921wleabcEoxlt-eengsairo.sqlite"
 	elif args.list_extensions:
-		for ext_id, ext_name in sorted(find_ext_info(profile_path)):
-			print("--extension", shlex.quote(ext_id), " #", ext_name)
+		# Write all lines at once rather than printing each of them separately
+		sys.stdout.write("".join(
+			f"--extension {shlex.quote(ext_id)}  # {ext_name}\n"
+			for ext_id, ext_name in sorted(find_ext_info(profile_path))
+		))
 
 		return 0
 	elif args.list_sites or args.site:
@@ -397,18 +842,19 @@ def main(argv=sys.argv[1:], program=sys.argv[0]):
 			# Add sites to list first, so that we can apply sorting before
 			# printing them
 			sites = []
-			for dirpath in storagebase.iterdir():
-				if dirpath.name.startswith("moz-extension") or "+++" not in dirpath.name:
+			with os.scandir(storagebase) as it:
+				dir_entries = list(it)
+			for dir_entry in dir_entries:
+				if dir_entry.name.startswith("moz-extension") or "+++" not in dir_entry.name:
 					# Extensions have special handling, so skip them here
 					continue
 				
-				if not (dirpath / "idb").is_dir():
+				if not os.path.isdir(os.path.join(dir_entry.path, "idb")):
 					# Skip sites not having any indexed IB stored
 					continue
 				
-				encoded_origin, ctx_name = dirpath.name, ""
-				if "^userContextId=" in encoded_origin:
-					encoded_origin, ctx_name = encoded_origin.split("^userContextId=", 1)
+				encoded_origin, _, ctx_name = dir_entry.name.partition("^userContextId=")
+				if ctx_name:
 					try:
 						ctx_id = int(ctx_name)
 					except ValueError:
@@ -419,26 +865,25 @@ def main(argv=sys.argv[1:], program=sys.argv[0]):
 						except KeyError:
 							pass  # Also keep unknown context IDs as-is
 				
-				scheme, netloc = encoded_origin.split("+++", 1)
-				if scheme == "file":
-					netloc = netloc.replace("+", "/")
-				else:
-					netloc = netloc.replace("+", ":")
+				scheme, _, netloc = encoded_origin.partition("+++")
+				netloc = netloc.translate(_FILE_TRANS if scheme == "file" else _ORIGIN_TRANS)
 				origin = scheme + "://" + netloc
 				
 				sites.append((origin, ctx_name))
 			sites.sort()
 			
 			# Print sorted list of sites with their user-context if applicable
+			lines = []
 			for origin, ctx_name in sites:
 				if ctx_name:
-					print("--site", shlex.quote(origin), "--userctx", shlex.quote(ctx_name))
+					lines.append(f"--site {shlex.quote(origin)} --userctx {shlex.quote(ctx_name)}\n")
 				else:
-					print("--site", shlex.quote(origin))
+					lines.append(f"--site {shlex.quote(origin)}\n")
+			sys.stdout.write("".join(lines))
 
 			return 0
 
-		site_name = args.site.replace(":", "+").replace("/", "+")
+		site_name = args.site.translate(_SITE_TRANS)
 		if ctx_id != 0:
 			site_name += f"^userContextId={ctx_id}"
 
@@ -468,9 +913,23 @@ def main(argv=sys.argv[1:], program=sys.argv[0]):
 
 	print(f"Using database path: {db_path}", file=sys.stderr)
 
+	import jmespath
+
+	from . import mozidb
 	with mozidb.IndexedDB(db_path) as conn:
-		pretty_printer = PrettyPrinter()
-		pretty_printer.pprint(jmespath.search(args.key_name, IDBObjectWrapper(conn)))
+		if args.daemon:
+			try:
+				serve_queries(args.daemon, conn)
+			except KeyboardInterrupt:
+				pass
+			except OSError as exc:
+				parser.error(f"Could not serve queries at {args.daemon}: {exc.strerror or exc}")
+				return 1
+			return 0
+
+		output = _format_result(jmespath.search(args.key_name, IDBObjectWrapper(conn)))
+
+	_write_output(output)
 
 	return 0
 
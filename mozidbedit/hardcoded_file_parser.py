@@ -1,18 +1,72 @@
+import json
+import math
 import mozserial
 import mozsnappy
-import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_dumps(obj):
+    return json.dumps(obj).encode("utf-8")
+
+def has_non_finite(obj):
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+def dumps(obj):
+    if orjson is None:
+        return json_dumps(obj)
+    try:
+        # Match `json.dumps`, which turns numeric keys into strings as well
+        output = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        # orjson rejects some values `json.dumps` handles (such as integers
+        # wider than 64 bits), so let the latter have another go
+        return json_dumps(obj)
+    # orjson writes NaN and +/-Infinity as `null`, json keeps them
+    if b'null' in output and has_non_finite(obj):
+        return json_dumps(obj)
+    return output
+
+# Number of entries serialized per `dumps` call
+CHUNK = 4096
 
 with open('15unsnapped', 'rb') as f:
     yes = mozserial.Reader(f)
     parsed = yes.read()
-    with open('15JSON.json', 'a') as f2:
-        f2.write('[')
-        for key in parsed:
+    items = list(parsed.items())
+
+    # Collect all serialized pieces and write them out at once, joining them
+    # with commas so that the output is valid JSON (no trailing comma)
+    parts = []
+    for i in range(0, len(items), CHUNK):
+        chunk = items[i:i + CHUNK]
+        try:
+            # Strip the surrounding brackets of the serialized list
+            parts.append(dumps([{key : value} for key, value in chunk])[1:-1])
+            continue
+        except Exception:
+            pass
+
+        # Redo the failing chunk entry-by-entry to report the bad entries
+        for key, value in chunk:
             try:
-                f2.write(json.dumps({key : parsed[key]}))
-                f2.write(',')
+                parts.append(dumps({key : value}))
             except Exception as e:
                 print(e)
-                print(key, parsed[key])
+                print(key, value)
                 continue
-        f2.write(']')
\ No newline at end of file
+
+with open('15JSON.json', 'wb') as f2:
+    f2.write(b'[' + b','.join(parts) + b']')
\ No newline at end of file
@@ -234,6 +234,8 @@ class KeyCodec:
 
 		if type != KeyType.BINARY:
 			result = result.decode("UTF-32le")
+		else:
+			result = bytes(result)  # Must be hashable for use as dict key
 		return result, index
 
 	@classmethod
@@ -320,7 +322,6 @@ class IndexedDB(sqlite3.Connection):
 				with open(self.files_dir / file_ids.removeprefix("."), "rb") as file:
 					reader = mozserial.Reader(io.BufferedReader(mozsnappy.Decompressor(file)))
 					content = reader.read()
-					print(content)
 
 			items[KeyCodec.decode(key_name)] = content
 